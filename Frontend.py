@@ -1,13 +1,19 @@
 import flet as ft
-from main import fetch_data_from_model
+from main import fetch_data_from_model, generate_title
+from jobs import JobManager
+from conversations import ConversationStore, Message, read_preview, CACHE_MAX_BYTES
 from datetime import datetime
 import time
 import threading
 import json
 import os
 
+# Message bubbles kept in chat_container; older ones are rebuilt on scroll-back
+MAX_RENDERED_MESSAGES = 60
+SCROLL_PAGE = 20
+
 class GlassmorphicChatbot:
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, cache_max_bytes=CACHE_MAX_BYTES):
         self.page = page
         print("DEBUG: Page attributes:", dir(self.page))
         self.page.window.frameless = True
@@ -16,10 +22,27 @@ class GlassmorphicChatbot:
         self.page.spacing = 0
         self.page.on_close = self.on_close
 
-        # Store conversations
-        self.conversations = []
+        # Store conversations (bodies are cached under an LRU memory cap)
+        self.conversations = ConversationStore(max_bytes=cache_max_bytes)
+        self.conversation_count = 0
+        # Sidebar previews: file -> (mtime, preview); bodies are only cached when opened
+        self.previews = {}
         self.current_messages = []
+        # Rendered window over current_messages; window_end None means following the live end
+        self.window_start = 0
+        self.window_end = None
+        # Replies currently streaming; scroll-back re-rendering waits for all of them
+        self.streaming = 0
+        self.streaming_lock = threading.Lock()
         self.current_conversation_file = None
+        self.titles = self.load_titles()
+        self.titles_requested = set()
+
+        # Background jobs (titles) - throttled while Iris is streaming
+        self.jobs = JobManager()
+        self.jobs.register("title", generate_title)
+        self.jobs.add_listener(self.on_job_done)
+        self.jobs.start()
 
         # Create UI
         self.setup_ui()
@@ -29,6 +52,45 @@ class GlassmorphicChatbot:
     def on_close(self, e):
         """Save current chat when the window closes."""
         self.save_current_conversation()
+        self.jobs.shutdown()
+
+    def load_titles(self):
+        """Read generated chat titles (conversation file -> title)."""
+        try:
+            with open("Iris/titles.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def on_job_done(self, job):
+        """Runs on the jobs thread when a background job finishes."""
+        if job["kind"] == "title" and job["status"] == "done" and job["result"]:
+            self.titles[job["key"]] = job["result"]
+            # Forget titles of conversations that have since been deleted
+            self.titles = {f: t for f, t in self.titles.items() if os.path.exists(f)}
+            try:
+                tmp = "Iris/titles.json.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self.titles, f, indent=2)
+                os.replace(tmp, "Iris/titles.json")
+            except Exception as ex:
+                print("❌ Error saving titles:", ex)
+            self.page.run_thread(self.load_saved_conversations)
+
+    def schedule_background_jobs(self):
+        """Queue title generation for the current chat, once per conversation."""
+        filename = self.current_conversation_file
+        if not filename or len(self.current_messages) < 2:
+            return
+        if filename in self.titles or filename in self.titles_requested:
+            return
+        self.titles_requested.add(filename)
+        if not self.jobs.has_job("title", filename):
+            self.jobs.submit(
+                "title",
+                key=filename,
+                first_message=self.current_messages[0].text,
+            )
 
     def save_current_conversation(self):
         """Save the current conversation to disk."""
@@ -45,7 +107,8 @@ class GlassmorphicChatbot:
                     )
 
                 with open(self.current_conversation_file, "w") as f:
-                    json.dump(self.current_messages, f, indent=2)
+                    json.dump([m.to_json() for m in self.current_messages], f, indent=2)
+                self.conversations.discard(self.current_conversation_file)
 
         except Exception as ex:
             print("❌ Error saving conversation:", ex)
@@ -64,31 +127,24 @@ class GlassmorphicChatbot:
             # sort newest first (change reverse=False if you prefer oldest-first)
             files.sort(key=os.path.getmtime, reverse=True)
 
-            # Clear current memory and UI list
-            self.conversations = []
+            # Clear UI list (cached bodies stay in the LRU store)
+            self.conversation_count = 0
             self.conversation_list.controls.clear()
 
-            for i, file in enumerate(files):
-                try:
-                    with open(file, "r", encoding="utf-8") as fh:
-                        conversation = json.load(fh)
-                except Exception as ex:
-                    print(f"Failed to read {file}: {ex}")
-                    continue
-
-                # Keep the conversation in memory so load_conversation can use it
-                self.conversations.append(conversation)
-
-                # Build preview (first item if present)
-                if conversation and len(conversation) > 0:
-                    first = str(conversation[0])
-                    preview = (first[:30] + "...") if len(first) > 30 else first
+            for file in files:
+                # Build preview (generated title, else first item if present)
+                if file in self.titles:
+                    preview = self.titles[file]
                 else:
-                    continue
+                    preview = self.get_preview(file)
+                    if not preview:
+                        continue
+
+                self.conversation_count += 1
 
-                # bind index with default argument to avoid late-binding trap
-                def _on_click(e, idx=i):
-                    self.load_conversation(idx)
+                # bind file with default argument to avoid late-binding trap
+                def _on_click(e, filename=file):
+                    self.load_conversation(filename)
 
                 conv_item = ft.Container(
                     content=ft.Text(
@@ -108,7 +164,7 @@ class GlassmorphicChatbot:
 
             # update UI
             self.page.update()
-            print(f"Loaded {len(self.conversations)} saved conversations.")
+            print(f"Loaded {self.conversation_count} saved conversations.")
 
         except Exception as e:
             print("❌ Error while loading conversation list:", e)
@@ -116,6 +172,20 @@ class GlassmorphicChatbot:
 
 
 
+    def get_preview(self, filename):
+        """Sidebar preview for filename, re-read only when the file changed."""
+        try:
+            mtime = os.path.getmtime(filename)
+            cached = self.previews.get(filename)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            preview = read_preview(filename)
+        except Exception as ex:
+            print(f"Failed to read {filename}: {ex}")
+            return None
+        self.previews[filename] = (mtime, preview)
+        return preview
+
     def setup_ui(self):
         # Create global snackbar to prevent thread crashes
         self.page.snack_bar = ft.SnackBar(
@@ -130,6 +200,8 @@ class GlassmorphicChatbot:
             padding=20,
             auto_scroll=True,
             expand=True,
+            on_scroll=self.on_chat_scroll,
+            on_scroll_interval=100,
         )
 
         # Message input field
@@ -324,17 +396,24 @@ class GlassmorphicChatbot:
         user_text = self.message_input.value.strip()
         if not user_text:
             return
+
+        # Jump back to the latest messages if the user scrolled back
+        if self.window_end is not None:
+            self.render_window(len(self.current_messages))
         
         # Append user message after validation
-        self.current_messages.append(user_text)
+        user_message = Message(user_text, True, time.time())
+        self.current_messages.append(user_message)
         self.message_input.value = ""
         self.page.update()
 
         # Add user's message instantly
-        self.add_message(user_text, is_user=True)
+        self.add_message(user_text, is_user=True, index=len(self.current_messages) - 1, ts=user_message.ts)
+        with self.streaming_lock:
+            self.streaming += 1
 
         # Simulate Iris thinking + responding
-        def simulate_ai():
+        def stream_reply():
             thinking_label = ft.Text("Iris is thinking...", color="#aaaaaa", italic=True)
             self.chat_container.controls.append(thinking_label)
             self.page.update()
@@ -342,7 +421,8 @@ class GlassmorphicChatbot:
 
             # Placeholder message for streaming
             ai_message_text = ft.Text("", color="#fafaf9", size=14, selectable=True)
-            timestamp_text = ft.Text(datetime.now().strftime("%H:%M"), color="#888888", size=10)
+            reply_ts = time.time()
+            timestamp_text = ft.Text(datetime.fromtimestamp(reply_ts).strftime("%H:%M"), color="#888888", size=10)
 
             # Copy button (floating top-right)
             copy_button = ft.IconButton(
@@ -376,12 +456,15 @@ class GlassmorphicChatbot:
                         alignment=ft.alignment.top_right,
                         padding=ft.padding.all(4),
                     ),
-                ]
+                ],
+                data=len(self.current_messages),
+                key=str(len(self.current_messages)),
             )
 
             # Add container to chat on the MAIN thread only
             self.page.run_thread(lambda: (
                 self.chat_container.controls.append(message_stack),
+                self.trim_rendered(),
                 self.chat_container.update()
             ))
 
@@ -404,10 +487,11 @@ class GlassmorphicChatbot:
                     ai_message_text.value = text
                     self.page.update()
 
-            for token in fetch_data_from_model(user_text):
-                full_text += token
-                self.page.run_thread(lambda t=full_text: update_text_safe(t))
-                time.sleep(0.01)
+            with self.jobs.foreground():
+                for token in fetch_data_from_model(user_text):
+                    full_text += token
+                    self.page.run_thread(lambda t=full_text: update_text_safe(t))
+                    time.sleep(0.01)
 
             # Show copy button safely
             def show_copy():
@@ -416,24 +500,34 @@ class GlassmorphicChatbot:
             
             self.page.run_thread(show_copy)
 
-            self.current_messages.append(full_text)
+            self.current_messages.append(Message(full_text, False, reply_ts))
             
             # Auto-save conversation after each exchange
             self.save_current_conversation()
+            self.schedule_background_jobs()
             
             #Show copy button after message is complete
             # copy_button.visible = True # Already handled safely above
             # self.page.update() # Unsafe call removed
 
+        def simulate_ai():
+            # Always re-enable scroll-back, even if the model request fails
+            try:
+                stream_reply()
+            finally:
+                with self.streaming_lock:
+                    self.streaming -= 1
+
         threading.Thread(target=simulate_ai, daemon=True).start()
 
 
-    def add_message(self, text, is_user=True):
-        timestamp = datetime.now().strftime("%H:%M")
+    def build_message(self, text, is_user=True, index=None, ts=None):
+        """Build a message bubble; index ties it to its position in current_messages."""
+        timestamp = datetime.fromtimestamp(ts).strftime("%H:%M") if ts else ""
 
         # 📝 Message text
         message_text = ft.Text(
-            "",
+            text,
             color="#f5f8fb",
             size=14,
             selectable=True,
@@ -448,7 +542,7 @@ class GlassmorphicChatbot:
             icon=ft.Icons.COPY_ALL_ROUNDED,
             icon_color="#4a9eff",
             tooltip="Copy message",
-            visible=False,
+            visible=bool(text),
             icon_size=18,
             on_click=lambda e: (
                 self.page.set_clipboard(message_text.value),
@@ -481,20 +575,29 @@ class GlassmorphicChatbot:
                     alignment=ft.alignment.top_right,
                     padding=ft.padding.only(right=4, top=4),
                 ),
-            ]
+            ],
+            data=index,
+            key=str(index) if index is not None else None,
         )
+        return stacked_message, message_text, copy_button
 
-        # Add message to chat container
-        self.chat_container.controls.append(stacked_message)
-        self.page.update()
-
+    def add_message(self, text, is_user=True, index=None, ts=None):
+        ts = ts or time.time()
         # 💬 User message: show instantly
         if is_user:
-            message_text.value = text
-            copy_button.visible = True
+            stacked_message, _, _ = self.build_message(text, is_user, index, ts)
+            self.chat_container.controls.append(stacked_message)
+            self.trim_rendered()
             self.page.update()
             return
 
+        stacked_message, message_text, copy_button = self.build_message("", is_user, index, ts)
+
+        # Add message to chat container
+        self.chat_container.controls.append(stacked_message)
+        self.trim_rendered()
+        self.page.update()
+
         # 🤖 AI message typing animation
         def type_message():
             buffer = ""
@@ -529,6 +632,41 @@ class GlassmorphicChatbot:
 
         threading.Thread(target=type_message, daemon=True).start()
 
+    def trim_rendered(self):
+        """Drop the oldest bubbles once more than MAX_RENDERED_MESSAGES are shown."""
+        controls = self.chat_container.controls
+        while len(controls) > MAX_RENDERED_MESSAGES:
+            controls.pop(0)
+        first = next((c.data for c in controls if isinstance(c.data, int)), None)
+        if first is not None:
+            self.window_start = first
+
+    def render_window(self, start):
+        """Rebuild chat_container for current_messages[start:start + MAX_RENDERED_MESSAGES]."""
+        start = max(0, min(start, len(self.current_messages) - MAX_RENDERED_MESSAGES))
+        end = start + MAX_RENDERED_MESSAGES
+        self.window_start = start
+        self.window_end = end if end < len(self.current_messages) else None
+        self.chat_container.auto_scroll = self.window_end is None
+        self.chat_container.controls = [
+            self.build_message(m.text, is_user=m.is_user, index=i, ts=m.ts)[0]
+            for i, m in enumerate(self.current_messages[start:end], start)
+        ]
+        self.page.update()
+
+    def on_chat_scroll(self, e: ft.OnScrollEvent):
+        """Rebuild older/newer bubbles when scrolling past the rendered window."""
+        if self.streaming:
+            return
+        if e.pixels <= 0 and self.window_start > 0:
+            anchor = self.window_start
+            self.render_window(self.window_start - SCROLL_PAGE)
+            self.chat_container.scroll_to(key=str(anchor), duration=0)
+        elif self.window_end is not None and e.pixels >= e.max_scroll_extent:
+            anchor = self.window_end - 1
+            self.render_window(self.window_start + SCROLL_PAGE)
+            self.chat_container.scroll_to(key=str(anchor), duration=0)
+
 
     def new_chat(self, e):
         """Start a new chat"""
@@ -544,6 +682,9 @@ class GlassmorphicChatbot:
 
             self.current_conversation_file = filename
             self.current_messages = []
+            self.window_start = 0
+            self.window_end = None
+            self.chat_container.auto_scroll = True
 
             # Clear chat window and show intro message
             self.chat_container.controls.clear()
@@ -556,35 +697,29 @@ class GlassmorphicChatbot:
         except Exception as e:
             print("❌ Error in new_chat:", e)
 
-    def load_conversation(self, index):
+    def load_conversation(self, filename):
         """Load a previous conversation"""
         try:
-            folder_path = "Iris/conversations"
-            files = [
-                os.path.join(folder_path, f)
-                for f in os.listdir(folder_path)
-                if f.startswith("conversation_") and f.endswith(".json")
-            ]
-            files.sort(key=os.path.getmtime, reverse=True)
-
-            if 0 <= index < len(files):
-                filename = files[index]
-                with open(filename, "r") as f:
-                    data = json.load(f)
+            messages = self.conversations.get(filename)
 
-                self.current_conversation_file = filename  # ✅ track current chat
-                self.current_messages = data
+            self.current_conversation_file = filename  # ✅ track current chat
+            self.current_messages = list(messages)
 
-                # Clear and reload chat window
-                self.chat_container.controls.clear()
-                for i, msg in enumerate(data):
-                    is_user = i % 2 == 0
-                    self.add_message(msg, is_user=is_user)
-                self.page.update()
+            # Render only the latest window; older bubbles are rebuilt on scroll-back
+            self.render_window(len(self.current_messages))
         except Exception as e:
             print("❌ Error loading conversation:", e)
 
 def main(page: ft.Page):
-    app = GlassmorphicChatbot(page)
+    # IRIS_CACHE_MB caps memory used by cached conversation bodies
+    cache_max_bytes = CACHE_MAX_BYTES
+    cache_mb = os.environ.get("IRIS_CACHE_MB")
+    if cache_mb:
+        try:
+            cache_max_bytes = int(float(cache_mb) * 1024 * 1024)
+        except ValueError:
+            print(f"WARNING: invalid IRIS_CACHE_MB={cache_mb!r}, using the default cache size")
+    app = GlassmorphicChatbot(page, cache_max_bytes=cache_max_bytes)
 
-ft.app(target=main)
+if __name__ == "__main__":
+    ft.app(target=main)
@@ -0,0 +1,85 @@
+"""Benchmark memory use of conversation state.
+
+Opens 500 saved chats of 500 messages each, once keeping every parsed body
+(the old self.conversations list) and once through the LRU ConversationStore,
+and reports tracemalloc current/peak plus process RSS.
+Run with: python bench_conversations.py
+"""
+import gc
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from conversations import CACHE_MAX_BYTES, ConversationStore
+
+CHATS = 500
+MESSAGES = 500
+WORDS = ["model", "python", "offline", "vision", "stream", "token", "iris", "chat", "image", "window"]
+
+
+def make_conversations(folder):
+    os.makedirs(folder, exist_ok=True)
+    files = []
+    for n in range(CHATS):
+        conv = [" ".join(random.choices(WORDS, k=random.randint(5, 40))) for _ in range(MESSAGES)]
+        path = os.path.join(folder, f"conversation_{n:05d}.json")
+        with open(path, "w") as f:
+            json.dump(conv, f)
+        files.append(path)
+    return files
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def open_unbounded(files):
+    conversations = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as fh:
+            conversations.append(json.load(fh))
+    return conversations
+
+
+def open_bounded(files):
+    store = ConversationStore(max_bytes=CACHE_MAX_BYTES)
+    for path in files:
+        # What the UI keeps for the open chat: the same Message records
+        current = list(store.get(path))
+    return store, current
+
+
+def measure(label, func, files):
+    gc.collect()
+    tracemalloc.start()
+    state = func(files)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:>10}: current {current / 2**20:8.1f} MiB, "
+        f"peak {peak / 2**20:8.1f} MiB, RSS {rss_mb():8.1f} MiB"
+    )
+    del state
+    gc.collect()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        files = make_conversations(os.path.join(tmp, "conversations"))
+        print(f"{CHATS} chats x {MESSAGES} messages, cache cap {CACHE_MAX_BYTES / 2**20:.0f} MiB")
+        # Bounded first so its RSS is not inflated by the unbounded run's high-water mark
+        measure("bounded", open_bounded, files)
+        measure("unbounded", open_unbounded, files)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Benchmark the background job subsystem.
+
+Reports CPU-job throughput, the foreground time-to-first-token (TTFT) of a
+simulated generation that starts while CPU jobs are already running, and how
+long a running model-bound job takes to back off once foreground() is entered.
+No model server is needed; the model-bound job is simulated.
+Run with: python bench_jobs.py
+"""
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+from jobs import JobManager
+
+WORDS = ["model", "python", "offline", "vision", "stream", "token", "iris", "chat", "image", "window"]
+SAMPLES = 5
+# Simulated title generation: (prompt evaluation seconds, seconds per token)
+MODEL_PROFILES = [(0.0, 0.03), (0.5, 0.03)]
+TITLE_TOKENS = 15
+
+preempted_at = []
+
+
+def build_conversation_index(folder, index_file):
+    """Rebuild the word -> conversation files index (CPU-bound, runs in a worker process)."""
+    index = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not (name.startswith("conversation_") and name.endswith(".json")):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                messages = json.load(fh)
+        except Exception:
+            continue
+        words = Counter(
+            w for msg in messages for w in re.findall(r"[a-z0-9]{3,}", str(msg).lower())
+        )
+        for word, count in words.items():
+            index.setdefault(word, []).append([path, count])
+
+    for postings in index.values():
+        postings.sort(key=lambda p: p[1], reverse=True)
+
+    tmp = index_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_file)
+    return len(index)
+
+
+def fake_title(prompt_eval, token_interval, checkpoint=None):
+    """Model-bound job: silent while the prompt is evaluated, then checkpoints per token."""
+    time.sleep(prompt_eval)
+    for _ in range(TITLE_TOKENS):
+        time.sleep(token_interval)
+        try:
+            checkpoint()
+        except Exception:
+            preempted_at.append(time.perf_counter())
+            raise
+    return "title"
+
+
+def make_conversations(folder, count=200, messages=40):
+    os.makedirs(folder, exist_ok=True)
+    for n in range(count):
+        conv = [" ".join(random.choices(WORDS, k=60)) + f" msg{n}x{i}" for i in range(messages)]
+        with open(os.path.join(folder, f"conversation_{n:05d}.json"), "w") as f:
+            json.dump(conv, f)
+
+
+def fake_generation(first_token_work=200_000):
+    """Time until a CPU-bound 'model' yields its first token."""
+    start = time.perf_counter()
+    total = 0
+    for i in range(first_token_work):
+        total += i * i
+    return time.perf_counter() - start
+
+
+def run_jobs(jobs, folder, index_file, count):
+    for n in range(count):
+        jobs.submit("index", key=n, folder=folder, index_file=f"{index_file}.{n}")
+
+
+def wait_running(jobs):
+    while not any(job["status"] == "running" for job in list(jobs.jobs.values())):
+        time.sleep(0.005)
+
+
+def wait_done(jobs):
+    while jobs.pending():
+        time.sleep(0.01)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "conversations")
+        index_file = os.path.join(tmp, "index.json")
+        make_conversations(folder)
+
+        jobs = JobManager(state_file=os.path.join(tmp, "jobs.json"))
+        jobs.register("index", build_conversation_index, cpu=True)
+        jobs.register("title", fake_title)
+        jobs.start()
+
+        # Throughput
+        count = 2 * jobs.max_workers
+        start = time.perf_counter()
+        run_jobs(jobs, folder, index_file, count)
+        wait_done(jobs)
+        elapsed = time.perf_counter() - start
+        print(f"index jobs: {count} in {elapsed:.2f}s ({count / elapsed:.2f} jobs/s, {jobs.max_workers} workers)")
+
+        # Foreground TTFT
+        idle = [fake_generation() for _ in range(SAMPLES)]
+
+        # Jobs already running when the generation starts, nothing held back
+        busy = []
+        for _ in range(SAMPLES):
+            run_jobs(jobs, folder, index_file, count)
+            wait_running(jobs)
+            busy.append(fake_generation())
+            wait_done(jobs)
+
+        # Same, but the generation enters foreground(): the running wave keeps
+        # going at WORKER_NICENESS, queued jobs are held until it ends
+        throttled = []
+        for _ in range(SAMPLES):
+            run_jobs(jobs, folder, index_file, count)
+            wait_running(jobs)
+            with jobs.foreground():
+                throttled.append(fake_generation())
+            wait_done(jobs)
+
+        for label, samples in (("idle", idle), ("busy", busy), ("foreground", throttled)):
+            print(f"TTFT {label:>10}: {statistics.median(samples) * 1000:.1f} ms (median of {len(samples)})")
+
+        # Model-bound preemption delay: foreground() entered 0.1s after the job starts
+        for prompt_eval, token_interval in MODEL_PROFILES:
+            delays = []
+            for _ in range(SAMPLES):
+                seen = len(preempted_at)
+                jobs.submit("title", key="bench", prompt_eval=prompt_eval, token_interval=token_interval)
+                wait_running(jobs)
+                time.sleep(0.1)
+                with jobs.foreground():
+                    entered = time.perf_counter()
+                    while len(preempted_at) == seen:
+                        time.sleep(0.001)
+                    delays.append(preempted_at[-1] - entered)
+                wait_done(jobs)
+            print(
+                f"title backoff (prompt eval {prompt_eval * 1000:.0f} ms, {token_interval * 1000:.0f} ms/token): "
+                f"{statistics.median(delays) * 1000:.1f} ms (median of {len(delays)})"
+            )
+
+        jobs.shutdown()
+
+
+if __name__ == "__main__":
+    main()
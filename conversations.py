@@ -0,0 +1,96 @@
+import json
+import sys
+from collections import OrderedDict
+from threading import Lock
+
+# Upper bound for cached conversation bodies; the open chat counts until it is next saved
+CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+class Message:
+    """One chat turn; ts is the send time (epoch seconds), None if unknown."""
+
+    __slots__ = ("text", "is_user", "ts")
+
+    def __init__(self, text, is_user, ts=None):
+        self.text = text
+        self.is_user = is_user
+        self.ts = ts
+
+    def size(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.text) + sys.getsizeof(self.ts)
+
+    def to_json(self):
+        return {"text": self.text, "is_user": self.is_user, "ts": self.ts}
+
+    @classmethod
+    def from_json(cls, item, index):
+        """Older files store plain strings with user turns at even indexes."""
+        if isinstance(item, dict):
+            return cls(str(item.get("text", "")), bool(item.get("is_user")), item.get("ts"))
+        return cls(str(item), index % 2 == 0)
+
+
+def read_conversation(filename):
+    """Parse a saved conversation file into a tuple of Message records."""
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return tuple(Message.from_json(item, i) for i, item in enumerate(data))
+
+
+def read_preview(filename, length=30):
+    """First message of a saved conversation, cut to length; None if it is empty."""
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not data:
+        return None
+    first = Message.from_json(data[0], 0).text
+    return (first[:length] + "...") if len(first) > length else first
+
+
+class ConversationStore:
+    """LRU cache of conversation bodies keyed by file, bounded by estimated size.
+
+    Evicted conversations are re-read from disk the next time they are opened.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, filename):
+        """Return the Message records for filename, loading it on a miss."""
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is not None:
+                self.entries.move_to_end(filename)
+                return entry[0]
+
+        messages = read_conversation(filename)
+        self.put(filename, messages)
+        return messages
+
+    def put(self, filename, messages):
+        size = sys.getsizeof(messages) + sum(m.size() for m in messages)
+        with self.lock:
+            old = self.entries.pop(filename, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[filename] = (messages, size)
+            self.total_bytes += size
+            # Keep at least the most recent entry even if it alone exceeds the cap
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def discard(self, filename):
+        """Drop a cached body, e.g. after the file was rewritten."""
+        with self.lock:
+            old = self.entries.pop(filename, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+
+    def __len__(self):
+        return len(self.entries)
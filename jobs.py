@@ -0,0 +1,282 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+JOBS_FILE = "Iris/jobs.json"
+# Added to the nice value of CPU workers so they yield to the UI and model server
+WORKER_NICENESS = 10
+
+
+class Preempted(Exception):
+    """Raised by JobManager.checkpoint() when a foreground generation starts."""
+
+
+class Stopped(Exception):
+    """Raised by JobManager.checkpoint() once shutdown() has been called."""
+
+
+class JobManager:
+    """Background jobs that must not compete with foreground streaming.
+
+    CPU-bound kinds run in a process pool, model-bound kinds are drained one
+    at a time from an asyncio queue. Every job is persisted to ``state_file``
+    until it finishes, so jobs interrupted by a restart are resumed by start().
+    While a foreground generation is active (see foreground()) no new job is
+    dispatched, and running model-bound jobs are aborted at their next
+    checkpoint and retried once the foreground is idle again. CPU jobs that
+    are already running are not paused; their workers run at a lower priority
+    (WORKER_NICENESS) instead.
+    """
+
+    def __init__(self, state_file=JOBS_FILE, max_workers=None):
+        self.state_file = state_file
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.handlers = {}
+        self.listeners = []
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.idle = threading.Event()
+        self.idle.set()
+        self._foreground = 0
+        self.stopping = False
+        # Persisted jobs of kinds not registered in this session, kept for a later one
+        self.dormant = []
+        self.pool = None
+        self.loop = None
+        self.model_queue = None
+        self.thread = None
+
+    def register(self, kind, func, cpu=False):
+        """Register a handler.
+
+        CPU handlers must be top-level (picklable) functions; the process pool
+        is created with the first one. Model-bound handlers are called with an
+        extra ``checkpoint`` argument and should call it between chunks so a
+        foreground generation or shutdown can interrupt them.
+        """
+        self.handlers[kind] = (func, cpu)
+        if cpu and self.pool is None:
+            # spawn, not fork: workers start lazily while flet and loop threads are running
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+
+    def add_listener(self, callback):
+        """callback(job) is called on the jobs thread when a job finishes or fails."""
+        self.listeners.append(callback)
+
+    def start(self):
+        """Start the event loop, then resume any persisted jobs."""
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.model_queue = asyncio.Queue()
+            self.loop.create_task(self._drain_model_queue())
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run_loop, daemon=True)
+        self.thread.start()
+        ready.wait()
+
+        for job in self._load_state():
+            job["status"] = "pending"
+            if job["kind"] in self.handlers:
+                self._enqueue(job)
+            else:
+                print(f"WARNING: no handler for persisted {job['kind']} job, keeping it for later")
+                self.dormant.append(job)
+        return self
+
+    def shutdown(self):
+        """Stop dispatching and interrupt running jobs.
+
+        Unfinished jobs are saved as pending so the next start() runs them once.
+        """
+        self.stopping = True
+        if self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._stop_loop(), self.loop)
+            self.thread.join(timeout=2)
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            for job in self.jobs.values():
+                job["status"] = "pending"
+            self._save_state()
+
+    def submit(self, kind, key=None, **kwargs):
+        """Queue a job unless one with the same kind and key is already queued or running.
+
+        A pending duplicate takes the new arguments; a running one is left as is.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self.lock:
+            existing = self._find(kind, key) if key is not None else None
+            if existing is not None:
+                if existing["status"] == "pending":
+                    existing["kwargs"] = kwargs
+                    self._save_state()
+                return existing["id"]
+            job = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "key": key,
+                "kwargs": kwargs,
+                "status": "pending",
+                "created": time.time(),
+            }
+            self._add(job)
+        self._dispatch(job)
+        return job["id"]
+
+    def has_job(self, kind, key):
+        """True if a job of this kind and key is queued or running."""
+        with self.lock:
+            return self._find(kind, key) is not None
+
+    def checkpoint(self):
+        """Called by model-bound handlers between chunks; aborts on foreground work or shutdown."""
+        if self.stopping:
+            raise Stopped()
+        if not self.idle.is_set():
+            raise Preempted()
+
+    @contextmanager
+    def foreground(self):
+        """Hold background dispatch while a foreground generation is streaming."""
+        with self.lock:
+            self._foreground += 1
+            self.idle.clear()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self._foreground -= 1
+                if self._foreground == 0:
+                    self.idle.set()
+
+    async def _stop_loop(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Waits for model-bound handler threads, which abort at their next checkpoint()
+        await self.loop.shutdown_default_executor()
+        self.loop.stop()
+
+    def pending(self):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job["status"] in ("pending", "running"))
+
+    def _find(self, kind, key):
+        """Caller holds self.lock."""
+        for job in self.jobs.values():
+            if job["kind"] == kind and job["key"] == key:
+                return job
+        return None
+
+    def _add(self, job):
+        """Caller holds self.lock."""
+        self.jobs[job["id"]] = job
+        self._save_state()
+
+    def _enqueue(self, job):
+        with self.lock:
+            self._add(job)
+        self._dispatch(job)
+
+    def _dispatch(self, job):
+        _, cpu = self.handlers[job["kind"]]
+        if cpu:
+            asyncio.run_coroutine_threadsafe(self._run(job), self.loop)
+        else:
+            self.loop.call_soon_threadsafe(self.model_queue.put_nowait, job)
+
+    async def _drain_model_queue(self):
+        while True:
+            job = await self.model_queue.get()
+            await self._run(job)
+
+    async def _wait_idle(self):
+        while not self.idle.is_set():
+            await asyncio.sleep(0.05)
+
+    async def _run(self, job):
+        func, cpu = self.handlers[job["kind"]]
+        try:
+            while True:
+                await self._wait_idle()
+                with self.lock:
+                    job["status"] = "running"
+                    self._save_state()
+                try:
+                    if cpu:
+                        result = await self.loop.run_in_executor(self.pool, _call, func, job["kwargs"])
+                    else:
+                        result = await asyncio.to_thread(
+                            func, checkpoint=self.checkpoint, **job["kwargs"]
+                        )
+                    break
+                except Preempted:
+                    # Foreground stream started; back off and retry when idle
+                    with self.lock:
+                        job["status"] = "pending"
+                        self._save_state()
+            job["status"] = "done"
+            job["result"] = result
+        except Exception as ex:
+            print(f"❌ Job {job['kind']} failed:", ex)
+            job["status"] = "failed"
+            job["error"] = str(ex)
+
+        with self.lock:
+            self.jobs.pop(job["id"], None)
+            self._save_state()
+        for callback in self.listeners:
+            try:
+                callback(job)
+            except Exception as ex:
+                print("❌ Job listener error:", ex)
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_state(self):
+        """Persist unfinished jobs; caller holds self.lock."""
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp = self.state_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(list(self.jobs.values()) + self.dormant, f, indent=2)
+            os.replace(tmp, self.state_file)
+        except Exception as ex:
+            print("❌ Error saving job state:", ex)
+
+
+def _call(func, kwargs):
+    return func(**kwargs)
+
+
+def _lower_priority():
+    """Process pool initializer: run CPU jobs below the UI and model server."""
+    if hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICENESS)
+        except OSError:
+            pass
@@ -36,6 +36,29 @@ def fetch_data_from_model(prompt:str):
                         print("Stream error:", e)
 
 
+def generate_title(first_message: str, checkpoint=None):
+    """Ask the model for a short chat title (run as a background job).
+
+    checkpoint() is called between tokens; if it raises, the stream is closed
+    so the model stops generating.
+    """
+    prompt = (
+        "Write a title of at most 6 words for a chat that starts with the message below. "
+        "Reply with the title only.\n\n" + first_message
+    )
+    tokens = []
+    stream = fetch_data_from_model(prompt)
+    try:
+        for token in stream:
+            if checkpoint:
+                checkpoint()
+            tokens.append(token)
+    finally:
+        stream.close()
+    title = "".join(tokens).strip().strip('"').splitlines()
+    return title[0][:60] if title else ""
+
+
 def new_conversation():
     # Ensure folder exists
     try: